@@ -0,0 +1,193 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import torch
+
+from detection import person_boxes
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceConfig:
+    """Core pinning, thread counts and niceness for each pipeline stage.
+
+    Example JSON:
+        {
+            "torch_threads": 3,
+            "torch_interop_threads": 1,
+            "opencv_threads": 1,
+            "stages": {
+                "main": {"cores": [0], "nice": 5},
+                "detection": {"cores": [1, 2, 3], "nice": 0}
+            }
+        }
+    """
+
+    def __init__(self, torch_threads=None, torch_interop_threads=None, opencv_threads=None, stages=None):
+        self.torch_threads = torch_threads
+        self.torch_interop_threads = torch_interop_threads
+        self.opencv_threads = opencv_threads
+        self.stages = stages or {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(
+            torch_threads=data.get('torch_threads'),
+            torch_interop_threads=data.get('torch_interop_threads'),
+            opencv_threads=data.get('opencv_threads'),
+            stages=data.get('stages', {}),
+        )
+
+    def to_dict(self):
+        return {
+            'torch_threads': self.torch_threads,
+            'torch_interop_threads': self.torch_interop_threads,
+            'opencv_threads': self.opencv_threads,
+            'stages': self.stages,
+        }
+
+    def apply_process(self):
+        """Set library thread counts; call once at startup before the model runs."""
+        if self.torch_threads is not None:
+            torch.set_num_threads(self.torch_threads)
+        if self.torch_interop_threads is not None:
+            try:
+                torch.set_num_interop_threads(self.torch_interop_threads)
+            except RuntimeError as e:
+                # Torch only allows this before any inter-op work has started
+                logger.warning(f"Could not set torch inter-op threads: {e}")
+        if self.opencv_threads is not None:
+            cv2.setNumThreads(self.opencv_threads)
+        logger.info(f"Thread counts: torch={torch.get_num_threads()}, "
+                    f"torch_interop={torch.get_num_interop_threads()}, opencv={cv2.getNumThreads()}")
+
+    def apply_stage(self, stage):
+        """Pin and renice the calling thread for the given stage.
+
+        On Linux both affinity and niceness are per thread, and threads spawned
+        afterwards (e.g. torch's worker pool) inherit the affinity.
+        """
+        settings = self.stages.get(stage)
+        if not settings:
+            return
+        cores = settings.get('cores')
+        if cores:
+            try:
+                os.sched_setaffinity(0, cores)
+            except (AttributeError, OSError) as e:
+                logger.warning(f"Could not pin {stage} stage to cores {cores}: {e}")
+        nice = settings.get('nice')
+        if nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+            except (AttributeError, OSError) as e:
+                logger.warning(f"Could not set niceness {nice} for {stage} stage: {e}")
+        logger.info(f"Applied resource settings for {stage} stage: {settings}")
+
+
+def load_frames(clip_path, max_frames):
+    """Decode up to max_frames frames from a replay clip."""
+    cap = cv2.VideoCapture(clip_path)
+    frames = []
+    try:
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def benchmark(model, frames, warmup=3):
+    """Return detection frames per second for the current thread settings."""
+    for frame in frames[:warmup]:
+        model(frame, verbose=False)
+    start = time.perf_counter()
+    for frame in frames:
+        results = model(frame, verbose=False)
+        # Include the post-processing the monitor does on every frame
+        person_boxes(results[0])
+    return len(frames) / (time.perf_counter() - start)
+
+
+def candidate_core_sets(cpu_count):
+    """All cores, plus leaving the first one or two cores free for capture, encoding and serial I/O."""
+    cores = list(range(cpu_count))
+    sets = [cores]
+    for reserved in (1, 2):
+        if cpu_count - reserved >= 1:
+            sets.append(cores[reserved:])
+    return sets
+
+
+def _run_candidate(clip_path, model_path, max_frames, config):
+    """Benchmark one candidate in a fresh process, pinned before torch creates its worker threads."""
+    from ultralytics import YOLO
+
+    config.apply_stage('detection')
+    config.apply_process()
+    frames = load_frames(clip_path, max_frames)
+    if not frames:
+        raise ValueError(f"Could not read any frames from {clip_path}")
+    return benchmark(YOLO(model_path), frames)
+
+
+def sweep(clip_path, model_path='yolov8n.pt', max_frames=60):
+    """Benchmark torch/OpenCV thread counts and core sets on a clip and return the best ResourceConfig.
+
+    Torch's worker threads keep the affinity and thread count they were created
+    with, so every candidate runs in its own freshly spawned process.
+    """
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    spawn = multiprocessing.get_context('spawn')
+
+    results = []
+    for cores, torch_threads, opencv_threads in itertools.product(
+            candidate_core_sets(cpu_count), range(1, cpu_count + 1), (0, 1, 2)):
+        if torch_threads > len(cores):
+            continue
+        config = ResourceConfig(
+            torch_threads=torch_threads,
+            opencv_threads=opencv_threads,
+            stages={'detection': {'cores': cores, 'nice': 0}},
+        )
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            fps = pool.submit(_run_candidate, clip_path, model_path, max_frames, config).result()
+        print(f"cores={cores} torch_threads={torch_threads} opencv_threads={opencv_threads}: {fps:.2f} FPS")
+        results.append((fps, config))
+
+    best_fps, best = max(results, key=lambda result: result[0])
+    # Give the remaining cores to the main thread
+    spare = [core for core in range(cpu_count) if core not in best.stages['detection']['cores']]
+    best.stages['main'] = {'cores': spare or list(range(cpu_count)), 'nice': 5}
+    return best_fps, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CPU resource settings for the people monitor")
+    parser.add_argument('clip', help="Replay clip to benchmark detection on")
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--output', help="Write the best settings to this JSON file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s: %(message)s')
+
+    best_fps, best = sweep(args.clip, args.model, args.frames)
+    print(f"\nBest: {best_fps:.2f} FPS")
+    print(json.dumps(best.to_dict(), indent=4))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(best.to_dict(), f, indent=4)
+        print(f"Saved to {args.output}")
@@ -0,0 +1,7 @@
+# COCO class index YOLO uses for people
+PERSON_CLASS = 0
+
+
+def person_boxes(result):
+    """Return the person detections from a single YOLO result."""
+    return [box for box in result.boxes if int(box.cls) == PERSON_CLASS]
@@ -0,0 +1,393 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import random
+import argparse
+
+# Default UDP port used by both the node publisher and the central collector
+DEFAULT_FLEET_PORT = 9870
+
+# Largest datagram we are willing to send; keeps packets under a typical MTU
+MAX_DATAGRAM_BYTES = 1200
+
+
+class FleetPublisher:
+    """Batch count and incident events from one monitor and send them to a collector over UDP."""
+
+    def __init__(self,
+                 collector_host,
+                 collector_port=DEFAULT_FLEET_PORT,
+                 node_id=None,
+                 flush_interval=1.0,
+                 max_batch=32,
+                 heartbeat_interval=5.0):
+        self.logger = logging.getLogger(__name__)
+        self.collector_host = collector_host
+        self.collector_port = collector_port
+        self.node_id = node_id or socket.gethostname()
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.heartbeat_interval = heartbeat_interval
+
+        # Boot id lets the collector tell a restarted node apart from a replayed packet
+        self.boot_id = os.urandom(4).hex()
+        self.seq = 0
+        self.events = []
+        self.last_flush = time.time()
+        self.last_count = None
+        self.last_count_time = 0
+        self.in_incident = False
+        self.lock = threading.Lock()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+        # Resolve the collector once; sendto() with a hostname would hit the resolver on every flush
+        self.collector = None
+        self.resolving = False
+        self.last_resolve_attempt = 0
+        self.resolve_retry_interval = 30.0
+        self._resolve()
+
+    def _resolve(self):
+        try:
+            info = socket.getaddrinfo(self.collector_host, self.collector_port, socket.AF_INET, socket.SOCK_DGRAM)
+            self.collector = info[0][4]
+            self.logger.info(f"Fleet collector {self.collector_host} resolved to {self.collector[0]}")
+        except OSError as e:
+            self.logger.warning(f"Failed to resolve fleet collector {self.collector_host}: {e}")
+        finally:
+            self.resolving = False
+
+    def _retry_resolve(self, now):
+        """Retry resolving in the background so a slow resolver never blocks the caller."""
+        if self.resolving or now - self.last_resolve_attempt < self.resolve_retry_interval:
+            return
+        self.resolving = True
+        self.last_resolve_attempt = now
+        threading.Thread(target=self._resolve, daemon=True).start()
+
+    def publish_count(self, people_count, now=None):
+        """Queue a count sample; unchanged counts are only resent as heartbeats.
+
+        Every count event carries the current incident flag, so a collector that
+        missed an incident datagram corrects itself on the next heartbeat.
+        """
+        now = time.time() if now is None else now
+        if people_count == self.last_count and now - self.last_count_time < self.heartbeat_interval:
+            self._maybe_flush(now)
+            return
+        self.last_count = people_count
+        self.last_count_time = now
+        self._queue(['c', round(now, 2), people_count, int(self.in_incident)], now)
+
+    def publish_incident(self, state, people_count, now=None):
+        """Queue an incident transition ('start' or 'end') and send it right away."""
+        now = time.time() if now is None else now
+        self.in_incident = state == 'start'
+        self._queue(['i', round(now, 2), people_count, state], now)
+        self.flush(now)
+
+    def _queue(self, event, now):
+        with self.lock:
+            self.events.append(event)
+        self._maybe_flush(now)
+
+    def _maybe_flush(self, now):
+        if len(self.events) >= self.max_batch or now - self.last_flush >= self.flush_interval:
+            self.flush(now)
+
+    def flush(self, now=None):
+        """Send all queued events, split across as many datagrams as needed."""
+        now = time.time() if now is None else now
+        with self.lock:
+            events, self.events = self.events, []
+            self.last_flush = now
+        if self.collector is None:
+            # Drop rather than buffer; the next heartbeat carries the current state anyway
+            self._retry_resolve(now)
+            return
+        while events:
+            batch = events[:self.max_batch]
+            events = events[self.max_batch:]
+            payload = self._encode(batch)
+            # Halve the batch until it fits into a single datagram
+            while len(payload) > MAX_DATAGRAM_BYTES and len(batch) > 1:
+                half = len(batch) // 2
+                events = batch[half:] + events
+                batch = batch[:half]
+                payload = self._encode(batch)
+            self._send(payload)
+
+    def _encode(self, batch):
+        packet = {'n': self.node_id, 'b': self.boot_id, 's': self.seq, 'e': batch}
+        return json.dumps(packet, separators=(',', ':')).encode('utf-8')
+
+    def _send(self, payload):
+        try:
+            self.sock.sendto(payload, self.collector)
+        except OSError as e:
+            # Never let the network stall or break the detection loop
+            self.logger.warning(f"Failed to send fleet update: {e}")
+        self.seq += 1
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.sock.close()
+
+
+class SiteRule:
+    """A site-wide rule: the combined count across a group of nodes must reach min_people."""
+
+    def __init__(self, name, nodes, min_people):
+        self.name = name
+        self.nodes = set(nodes)
+        self.min_people = min_people
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['nodes'], int(data['min_people']))
+
+
+class NodeState:
+    def __init__(self, boot_id):
+        self.boot_id = boot_id
+        self.last_seq = -1
+        self.count = None
+        self.count_time = 0
+        self.last_seen = 0
+        self.in_incident = False
+        self.received = 0
+        self.dropped = 0
+        self.duplicates = 0
+
+
+class FleetCollector:
+    """Merge event streams from many nodes, apply site rules and deduplicate alerts."""
+
+    def __init__(self,
+                 rules=(),
+                 alert_callback=None,
+                 stale_after=15.0,
+                 realert_interval=300.0):
+        self.logger = logging.getLogger(__name__)
+        self.rules = list(rules)
+        self.alert_callback = alert_callback or self._log_alert
+        self.stale_after = stale_after
+        self.realert_interval = realert_interval
+
+        self.nodes = {}
+        # Active alerts keyed by (kind, subject) so each incident is reported once
+        self.active_alerts = {}
+        self.lock = threading.Lock()
+        self.sock = None
+        self.running = False
+
+    def _log_alert(self, key, message):
+        self.logger.warning(f"FLEET ALERT [{key[0]}:{key[1]}]: {message}")
+
+    def handle_datagram(self, data, now=None):
+        """Decode one datagram and fold its events into the fleet state."""
+        now = time.time() if now is None else now
+        try:
+            packet = json.loads(data.decode('utf-8'))
+            node_id = str(packet['n'])
+            boot_id = packet['b']
+            seq = int(packet['s'])
+            events = packet['e']
+            if not isinstance(events, list):
+                raise TypeError("events must be a list")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.logger.warning(f"Ignoring malformed fleet packet: {e}")
+            return
+
+        with self.lock:
+            node = self.nodes.get(node_id)
+            if node is None or node.boot_id != boot_id:
+                if node is not None:
+                    self.logger.info(f"Node {node_id} restarted")
+                node = NodeState(boot_id)
+                self.nodes[node_id] = node
+
+            if seq <= node.last_seq:
+                node.duplicates += 1
+                return
+            if node.last_seq >= 0 and seq > node.last_seq + 1:
+                node.dropped += seq - node.last_seq - 1
+            node.last_seq = seq
+            node.last_seen = now
+            node.received += 1
+
+            for event in events:
+                if not self._valid_event(event):
+                    self.logger.warning(f"Ignoring malformed event from {node_id}: {event!r}")
+                    continue
+                self._apply_event(node_id, node, event)
+
+        self.evaluate(now)
+
+    @staticmethod
+    def _valid_event(event):
+        if not isinstance(event, list) or len(event) < 3:
+            return False
+        kind, ts, people_count = event[0], event[1], event[2]
+        if not isinstance(ts, (int, float)) or isinstance(ts, bool):
+            return False
+        if not isinstance(people_count, int) or isinstance(people_count, bool) or people_count < 0:
+            return False
+        if kind == 'c':
+            return len(event) == 3 or event[3] in (0, 1)
+        if kind == 'i':
+            return len(event) >= 4 and event[3] in ('start', 'end')
+        return False
+
+    def _apply_event(self, node_id, node, event):
+        kind, ts, people_count = event[0], event[1], event[2]
+        # Events inside a batch may arrive out of order relative to earlier batches
+        if ts < node.count_time:
+            return
+        node.count = people_count
+        node.count_time = ts
+        if kind == 'i':
+            node.in_incident = event[3] == 'start'
+        elif len(event) > 3:
+            node.in_incident = bool(event[3])
+
+    def evaluate(self, now=None):
+        """Re-check node incidents and site rules, raising and clearing alerts as needed."""
+        now = time.time() if now is None else now
+        alerts = []
+        with self.lock:
+            live = {node_id: node for node_id, node in self.nodes.items()
+                    if now - node.last_seen <= self.stale_after}
+
+            for node_id, node in self.nodes.items():
+                self._update_alert(alerts, ('node', node_id), node.in_incident and node_id in live, now,
+                                   f"Node {node_id} reports an incident ({node.count} person(s) detected)")
+                self._update_alert(alerts, ('stale', node_id), node_id not in live, now,
+                                   f"Node {node_id} has not reported for over {self.stale_after:.0f}s")
+
+            for rule in self.rules:
+                reporting = [live[n] for n in rule.nodes if n in live and live[n].count is not None]
+                if len(reporting) < len(rule.nodes):
+                    # Unknown until every node reports: leave the rule alert as it is,
+                    # the stale alerts already cover the missing nodes
+                    continue
+                total = sum(node.count for node in reporting)
+                self._update_alert(alerts, ('rule', rule.name), total < rule.min_people, now,
+                                   f"Only {total} person(s) across {rule.name} (minimum {rule.min_people})")
+
+        for key, message in alerts:
+            self.alert_callback(key, message)
+
+    def _update_alert(self, alerts, key, active, now, message):
+        if active:
+            raised_at = self.active_alerts.get(key)
+            if raised_at is None or now - raised_at >= self.realert_interval:
+                self.active_alerts[key] = now
+                alerts.append((key, message))
+        elif key in self.active_alerts:
+            del self.active_alerts[key]
+            self.logger.info(f"Fleet alert cleared: {key[0]}:{key[1]}")
+
+    def stats(self):
+        with self.lock:
+            return {node_id: {'count': node.count,
+                              'in_incident': node.in_incident,
+                              'received': node.received,
+                              'dropped': node.dropped,
+                              'duplicates': node.duplicates}
+                    for node_id, node in self.nodes.items()}
+
+    def serve(self, host='0.0.0.0', port=DEFAULT_FLEET_PORT):
+        """Receive datagrams until stop() is called."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.settimeout(1.0)
+        self.running = True
+        self.logger.info(f"Fleet collector listening on {host}:{port}")
+        try:
+            while self.running:
+                try:
+                    data, _ = self.sock.recvfrom(65535)
+                except socket.timeout:
+                    # Still evaluate so silent nodes are flagged as stale
+                    self.evaluate()
+                    continue
+                try:
+                    self.handle_datagram(data)
+                except Exception as e:
+                    # A bad datagram or alert callback must never take down fleet alerting
+                    self.logger.error(f"Error handling fleet datagram: {e}")
+        finally:
+            self.sock.close()
+
+    def stop(self):
+        self.running = False
+
+
+def load_rules(path):
+    with open(path) as f:
+        return [SiteRule.from_dict(rule) for rule in json.load(f)]
+
+
+def simulate_nodes(count, host, port, duration, min_people=2):
+    """Run simulated nodes as threads on this machine, each with a random-walk people count."""
+    def run_node(index):
+        publisher = FleetPublisher(host, port, node_id=f'sim-{index:02d}')
+        people_count = random.randint(0, 3)
+        in_incident = False
+        end_time = time.time() + duration
+        while time.time() < end_time:
+            people_count = max(0, people_count + random.choice((-1, 0, 0, 0, 1)))
+            publisher.publish_count(people_count)
+            if people_count < min_people and not in_incident:
+                publisher.publish_incident('start', people_count)
+                in_incident = True
+            elif people_count >= min_people and in_incident:
+                publisher.publish_incident('end', people_count)
+                in_incident = False
+            time.sleep(0.05)
+        publisher.close()
+
+    threads = [threading.Thread(target=run_node, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="People monitor fleet collector")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    collect_parser = subparsers.add_parser('collect', help="Run the central collector")
+    collect_parser.add_argument('--host', default='0.0.0.0')
+    collect_parser.add_argument('--port', type=int, default=DEFAULT_FLEET_PORT)
+    collect_parser.add_argument('--rules', help="JSON file with a list of {name, nodes, min_people} rules")
+
+    simulate_parser = subparsers.add_parser('simulate', help="Run simulated nodes against a collector")
+    simulate_parser.add_argument('--host', default='127.0.0.1')
+    simulate_parser.add_argument('--port', type=int, default=DEFAULT_FLEET_PORT)
+    simulate_parser.add_argument('--nodes', type=int, default=24)
+    simulate_parser.add_argument('--duration', type=float, default=30.0)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+
+    if args.command == 'collect':
+        collector = FleetCollector(rules=load_rules(args.rules) if args.rules else ())
+        try:
+            collector.serve(args.host, args.port)
+        except KeyboardInterrupt:
+            print("\nStopping collector...")
+            for node_id, stats in sorted(collector.stats().items()):
+                print(f"{node_id}: {stats}")
+    else:
+        simulate_nodes(args.nodes, args.host, args.port, args.duration)
@@ -0,0 +1,175 @@
+import argparse
+import csv
+from collections import deque
+
+# Incident states
+CLEAR = 'clear'
+PENDING = 'pending'        # below minimum, waiting out enter_dwell
+ACTIVE = 'active'          # confirmed incident
+RECOVERING = 'recovering'  # back at minimum, waiting out exit_dwell
+
+
+class Incident:
+    def __init__(self, start_time, people_count):
+        self.start_time = start_time
+        self.end_time = None
+        self.min_count = people_count
+
+    @property
+    def duration(self):
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def to_dict(self):
+        return {
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration': self.duration,
+            'min_count': self.min_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        incident = cls(data['start_time'], data['min_count'])
+        incident.end_time = data['end_time']
+        return incident
+
+
+class IncidentStateMachine:
+    """Debounce per-frame people counts into incidents.
+
+    An incident starts once the count has stayed below min_people for enter_dwell
+    seconds, and ends once it has stayed at or above min_people + hysteresis for
+    exit_dwell seconds. Single-frame dips and recoveries are ignored, so each real
+    incident produces exactly one 'start' and one 'end' event.
+    """
+
+    def __init__(self, min_people, enter_dwell=1.0, exit_dwell=3.0, hysteresis=0, max_history=100):
+        self.min_people = min_people
+        self.enter_dwell = enter_dwell
+        self.exit_dwell = exit_dwell
+        self.hysteresis = hysteresis
+
+        self.state = CLEAR
+        self.since = None
+        self.incident = None
+        self.pending_min = None
+        # Finished incidents, most recent last; bounded so long-running monitors don't grow
+        self.incidents = deque(maxlen=max_history)
+
+    def update(self, people_count, now):
+        """Feed one observation; return 'start', 'end' or None."""
+        below = people_count < self.min_people
+        recovered = people_count >= self.min_people + self.hysteresis
+
+        if self.state == CLEAR:
+            if below:
+                self.state = PENDING
+                self.since = now
+                self.pending_min = people_count
+                return self._check_enter(now)
+        elif self.state == PENDING:
+            if not below:
+                self.state = CLEAR
+                self.since = None
+            else:
+                self.pending_min = min(self.pending_min, people_count)
+                return self._check_enter(now)
+        elif self.state == ACTIVE:
+            self.incident.min_count = min(self.incident.min_count, people_count)
+            if recovered:
+                self.state = RECOVERING
+                self.since = now
+                return self._check_exit(now)
+        elif self.state == RECOVERING:
+            if not recovered:
+                # Dipped again before exit_dwell elapsed: still the same incident
+                self.incident.min_count = min(self.incident.min_count, people_count)
+                self.state = ACTIVE
+                self.since = None
+            else:
+                return self._check_exit(now)
+        return None
+
+    def _check_enter(self, now):
+        if now - self.since < self.enter_dwell:
+            return None
+        # Date the incident from the first frame below minimum, not from confirmation
+        self.incident = Incident(self.since, self.pending_min)
+        self.state = ACTIVE
+        self.since = None
+        return 'start'
+
+    def _check_exit(self, now):
+        if now - self.since < self.exit_dwell:
+            return None
+        # The incident ended when the count first recovered
+        return self._end(self.since)
+
+    def _end(self, end_time):
+        self.incident.end_time = end_time
+        self.incidents.append(self.incident)
+        self.state = CLEAR
+        self.since = None
+        return 'end'
+
+    def checkpoint(self):
+        """Return the machine's state as a JSON-serializable dict, for resuming later with restore()."""
+        return {
+            'state': self.state,
+            'since': self.since,
+            'pending_min': self.pending_min,
+            'incident': self.incident.to_dict() if self.incident is not None else None,
+            'incidents': [incident.to_dict() for incident in self.incidents],
+        }
+
+    def restore(self, data):
+        self.state = data['state']
+        self.since = data['since']
+        self.pending_min = data['pending_min']
+        self.incident = Incident.from_dict(data['incident']) if data['incident'] is not None else None
+        self.incidents.clear()
+        self.incidents.extend(Incident.from_dict(incident) for incident in data['incidents'])
+
+    @property
+    def in_incident(self):
+        return self.state in (ACTIVE, RECOVERING)
+
+    def finish(self, now):
+        """Close any open incident, e.g. on shutdown or end of a replay. Returns 'end' or None."""
+        if not self.in_incident:
+            self.state = CLEAR
+            return None
+        return self._end(self.since if self.state == RECOVERING else now)
+
+
+def replay_counts(samples, min_people, enter_dwell=1.0, exit_dwell=3.0, hysteresis=0):
+    """Run (timestamp, people_count) samples through a state machine and return the incidents."""
+    machine = IncidentStateMachine(min_people, enter_dwell, exit_dwell, hysteresis, max_history=None)
+    last_time = None
+    for timestamp, people_count in samples:
+        machine.update(people_count, timestamp)
+        last_time = timestamp
+    if last_time is not None:
+        machine.finish(last_time)
+    return list(machine.incidents)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded count sequence through the incident state machine")
+    parser.add_argument('counts', help="CSV file with timestamp,people_count rows")
+    parser.add_argument('--min-people', type=int, default=2)
+    parser.add_argument('--enter-dwell', type=float, default=1.0)
+    parser.add_argument('--exit-dwell', type=float, default=3.0)
+    parser.add_argument('--hysteresis', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.counts) as f:
+        samples = [(float(row[0]), int(row[1])) for row in csv.reader(f) if row and not row[0].startswith('#')]
+
+    incidents = replay_counts(samples, args.min_people, args.enter_dwell, args.exit_dwell, args.hysteresis)
+    print(f"{len(incidents)} incident(s) from {len(samples)} samples")
+    for incident in incidents:
+        print(f"  {incident.start_time:.2f} -> {incident.end_time:.2f}: "
+              f"{incident.duration:.2f}s, minimum {incident.min_count} person(s)")
@@ -5,12 +5,20 @@ import smtplib
 from email.mime.text import MIMEText
 import time
 import threading
+from collections import deque
 import os
 import sys
 from datetime import datetime
 import logging
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from fleet import FleetPublisher, DEFAULT_FLEET_PORT
+from memory_guard import MemoryGuard
+from incident_state import IncidentStateMachine, PENDING
+from status_board import StatusBoardWriter
+from detection import person_boxes
+from thermal_governor import ThermalGovernor, DEFAULT_SYSFS_ROOT
+from cpu_tuning import ResourceConfig
 import RPi.GPIO as GPIO
 
 # ANSI escape codes for colors
@@ -91,7 +99,17 @@ class PeopleMonitor:
                  email_recipient='team_lead@example.com', 
                  min_people=2, 
                  check_interval=300,
-                 log_dir='./monitoring_logs'):
+                 log_dir='./monitoring_logs',
+                 fleet_collector=None,
+                 fleet_port=DEFAULT_FLEET_PORT,
+                 node_id=None,
+                 thermal_sysfs_root=DEFAULT_SYSFS_ROOT,
+                 resource_config=None,
+                 memory_budget_mb=None,
+                 incident_enter_dwell=1.0,
+                 incident_exit_dwell=3.0,
+                 incident_hysteresis=0,
+                 status_board_name=None):
         # Setup logging
         os.makedirs(log_dir, exist_ok=True)
         logging.basicConfig(
@@ -104,6 +122,11 @@ class PeopleMonitor:
         )
         self.logger = logging.getLogger(__name__)
 
+        # CPU resources: thread counts must be set before the model is loaded
+        self.resource_config = ResourceConfig.load(resource_config) if resource_config else ResourceConfig()
+        self.resource_config.apply_process()
+        self.resource_config.apply_stage('main')
+
         # People detection setup
         self.model = YOLO('yolov8n.pt')
         
@@ -123,6 +146,43 @@ class PeopleMonitor:
         self.monitoring = False
         self.log_dir = log_dir
         
+        # Incident debouncing: separate enter/exit dwell times so brief dips don't churn recordings
+        self.people_count = 0
+        self.incident_state = IncidentStateMachine(
+            min_people,
+            enter_dwell=incident_enter_dwell,
+            exit_dwell=incident_exit_dwell,
+            hysteresis=incident_hysteresis
+        )
+        # Frames seen while an incident is being confirmed, written once it starts
+        self.pending_frames = deque(maxlen=30)
+        
+        # Fleet aggregation: publish counts and incidents to a central collector
+        self.fleet_publisher = None
+        if fleet_collector:
+            self.fleet_publisher = FleetPublisher(fleet_collector, fleet_port, node_id=node_id)
+        
+        # Thermal governor: trade detection rate/resolution for temperature headroom
+        self.thermal_governor = ThermalGovernor(sysfs_root=thermal_sysfs_root)
+        if not os.path.exists(self.thermal_governor.temp_path):
+            self.logger.info(f"No SoC temperature sensor at {self.thermal_governor.temp_path}, thermal governor disabled")
+            self.thermal_governor = None
+        
+        # Shared-memory status board for local consumers (door display, snapshot scripts)
+        self.status_board = StatusBoardWriter(name=status_board_name) if status_board_name else None
+        
+        # Memory budget and leak diagnostics (send SIGUSR1 for a tracemalloc report)
+        self.frame_bytes = 0
+        self.memory_guard = MemoryGuard(budget_mb=memory_budget_mb)
+        self.memory_guard.register_component('frames', lambda: self.frame_bytes)
+        self.memory_guard.register_component('pending_frames', lambda: sum(f.nbytes for f in self.pending_frames))
+        self.memory_guard.register_component(
+            'model', lambda: sum(p.numel() * p.element_size() for p in self.model.model.parameters()))
+        self.memory_guard.register_shedder('pending_frames', self.disable_pending_frames)
+        if self.status_board is not None:
+            self.memory_guard.register_shedder('status_board', self.disable_status_board)
+        self.memory_guard.install_signal_handler()
+        
         # Video recording setup
         self.video_writer = None
         self.current_video_path = None
@@ -180,6 +240,8 @@ class PeopleMonitor:
             self.logger.info(f"Started video recording: {self.current_video_path}")
         except Exception as e:
             self.logger.error(f"Error starting video recording: {e}")
+            if self.video_writer is not None:
+                self.video_writer.release()
             self.video_writer = None
 
     def stop_video_recording(self):
@@ -194,6 +256,30 @@ class PeopleMonitor:
             self.video_writer = None
             self.current_video_path = None
 
+    def disable_pending_frames(self):
+        # Incidents still record from confirmation onwards, just without the lead-in frames
+        self.pending_frames = deque(maxlen=0)
+
+    def disable_status_board(self):
+        if self.status_board is not None:
+            self.status_board.close()
+            self.status_board = None
+
+    def write_incident_frame(self, frame):
+        if self.video_writer is not None:
+            try:
+                self.video_writer.write(frame)
+            except Exception as e:
+                self.logger.error(f"Error writing incident video frame: {e}")
+
+    def end_incident(self):
+        incident = self.incident_state.incidents[-1]
+        self.stop_video_recording()
+        self.logger.info(f"Incident ended after {incident.duration:.1f}s "
+                         f"(minimum {incident.min_count} person(s) detected)")
+        if self.fleet_publisher is not None:
+            self.fleet_publisher.publish_incident('end', self.people_count)
+
     def display_frame(self, frame, people_count):
         try:
             # Clear the previous line in terminal
@@ -233,15 +319,14 @@ class PeopleMonitor:
 
     def detect_and_display_people(self):
         try:
+            self.resource_config.apply_stage('detection')
             self.cap = find_available_camera()
             if self.cap is None:
                 self.logger.error("Error: Could not find any available cameras")
                 return
             
-            recording_started = False
+            people = None
             print("\n")  # Add initial newline for status updates
-            last_alert_time = 0
-            alert_interval = 5  # Minimum seconds between alerts
             
             while self.monitoring:
                 ret, frame = self.cap.read()
@@ -249,18 +334,33 @@ class PeopleMonitor:
                     self.logger.error("Failed to grab frame")
                     break
                 
-                # Detect people using YOLO
-                results = self.model(frame, verbose=False)
+                # Let the thermal governor pick the detection rate and input size
+                imgsz = 640
+                run_detection = True
+                if self.thermal_governor is not None:
+                    self.thermal_governor.update()
+                    imgsz = self.thermal_governor.imgsz
+                    run_detection = self.thermal_governor.should_detect()
                 
-                # Filter only person class (class 0 is person)
-                people = [box for box in results[0].boxes if int(box.cls) == 0]
+                # Detect people using YOLO, reusing the last detections on skipped frames
+                if run_detection or people is None:
+                    results = self.model(frame, imgsz=imgsz, verbose=False)
+                    
+                    # Filter only person class (class 0 is person)
+                    people = person_boxes(results[0])
                 people_count = len(people)
+                self.people_count = people_count
+                
+                # Publish the count to the fleet collector
+                if self.fleet_publisher is not None:
+                    self.fleet_publisher.publish_count(people_count)
                 
                 # Update LED based on people count
                 self.update_led(people_count)
                 
                 # Draw bounding boxes
                 frame_with_boxes = frame.copy()
+                self.frame_bytes = frame.nbytes + frame_with_boxes.nbytes
                 for box in people:
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     color = (0, 0, 255) if people_count < self.min_people else (0, 255, 0)
@@ -276,27 +376,36 @@ class PeopleMonitor:
                 
                 current_time = time.time()
                 
-                # Handle recording if fewer than minimum people
-                if people_count < self.min_people:
-                    if not recording_started:
-                        self.start_video_recording()
-                        recording_started = True
-                    
-                    if self.video_writer is not None:
-                        try:
-                            self.video_writer.write(frame_with_boxes)  # Save frame with boxes
-                        except Exception as e:
-                            self.logger.error(f"Error writing video frame: {e}")
-                    
-                    # Only log alerts at the specified interval
-                    if current_time - last_alert_time >= alert_interval:
-                        alert_message = f"SECURITY ALERT: Only {people_count} person(s) detected in sensitive project area!"
-                        self.logger.warning(alert_message)
-                        last_alert_time = current_time
+                # Debounce the count into incidents: one recording and one alert per real incident
+                event = self.incident_state.update(people_count, current_time)
+                if event == 'start':
+                    self.start_video_recording()
+                    alert_message = f"SECURITY ALERT: Only {people_count} person(s) detected in sensitive project area!"
+                    self.logger.warning(alert_message)
+                    if self.fleet_publisher is not None:
+                        self.fleet_publisher.publish_incident('start', people_count)
+                    # Include the frames seen while the incident was being confirmed
+                    for pending_frame in self.pending_frames:
+                        self.write_incident_frame(pending_frame)
+                elif event == 'end':
+                    self.end_incident()
+                
+                if self.incident_state.in_incident:
+                    self.write_incident_frame(frame_with_boxes)
+                    self.pending_frames.clear()
+                elif self.incident_state.state == PENDING:
+                    self.pending_frames.append(frame_with_boxes)
                 else:
-                    if recording_started:
-                        self.stop_video_recording()
-                        recording_started = False
+                    self.pending_frames.clear()
+                
+                # Publish to the status board; readers never block this
+                if self.status_board is not None:
+                    try:
+                        self.status_board.publish(frame, frame_with_boxes, people_count, self.incident_state.state)
+                    except Exception as e:
+                        self.logger.error(f"Error publishing to status board: {e}")
+                
+                self.memory_guard.check()
                 
                 time.sleep(0.05)  # Reduced sleep time for smoother operation
             
@@ -312,7 +421,11 @@ class PeopleMonitor:
             # Ensure cleanup happens
             if hasattr(self, 'cap') and self.cap is not None:
                 self.cap.release()
+            if self.incident_state.finish(time.time()) == 'end':
+                self.end_incident()
+            self.pending_frames.clear()
             self.stop_video_recording()
+            self.disable_status_board()
 
     def start_monitoring(self):
         self.monitoring = True
@@ -326,6 +439,8 @@ class PeopleMonitor:
         if hasattr(self, 'cap') and self.cap is not None:
             self.cap.release()
         self.stop_video_recording()
+        if self.fleet_publisher is not None:
+            self.fleet_publisher.close()
         # Turn off LED before closing
         GPIO.output(LED_PIN, GPIO.LOW)
         GPIO.cleanup()
@@ -5,12 +5,18 @@ import smtplib
 from email.mime.text import MIMEText
 import time
 import threading
+from collections import deque
 import os
 import sys
 from datetime import datetime
 import logging
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from fleet import FleetPublisher, DEFAULT_FLEET_PORT
+from memory_guard import MemoryGuard
+from incident_state import IncidentStateMachine, PENDING
+from status_board import StatusBoardWriter
+from detection import person_boxes
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QImage, QPixmap
@@ -53,6 +59,14 @@ class PeopleMonitor:
                  min_people=2, 
                  check_interval=300,
                  log_dir='./monitoring_logs',
+                 fleet_collector=None,
+                 fleet_port=DEFAULT_FLEET_PORT,
+                 node_id=None,
+                 memory_budget_mb=None,
+                 incident_enter_dwell=1.0,
+                 incident_exit_dwell=3.0,
+                 incident_hysteresis=0,
+                 status_board_name=None,
                  display_method='qt'):
         # Setup logging
         os.makedirs(log_dir, exist_ok=True)
@@ -84,13 +98,47 @@ class PeopleMonitor:
         self.check_interval = check_interval
         self.monitoring = False
         self.log_dir = log_dir
+        
+        # Incident debouncing: separate enter/exit dwell times so brief dips don't churn recordings
+        self.people_count = 0
+        self.incident_state = IncidentStateMachine(
+            min_people,
+            enter_dwell=incident_enter_dwell,
+            exit_dwell=incident_exit_dwell,
+            hysteresis=incident_hysteresis
+        )
+        # Frames seen while an incident is being confirmed, written once it starts
+        self.pending_frames = deque(maxlen=30)
+        
+        # Fleet aggregation: publish counts and incidents to a central collector
+        self.fleet_publisher = None
+        if fleet_collector:
+            self.fleet_publisher = FleetPublisher(fleet_collector, fleet_port, node_id=node_id)
         self.display_method = display_method
         
+        # Shared-memory status board for local consumers (door display, snapshot scripts)
+        self.status_board = StatusBoardWriter(name=status_board_name) if status_board_name else None
+        
+        # Memory budget and leak diagnostics (send SIGUSR1 for a tracemalloc report)
+        self.frame_bytes = 0
+        self.memory_guard = MemoryGuard(budget_mb=memory_budget_mb)
+        self.memory_guard.register_component('frames', lambda: self.frame_bytes)
+        self.memory_guard.register_component('pending_frames', lambda: sum(f.nbytes for f in self.pending_frames))
+        self.memory_guard.register_component(
+            'model', lambda: sum(p.numel() * p.element_size() for p in self.model.model.parameters()))
+        self.memory_guard.register_shedder('pending_frames', self.disable_pending_frames)
+        self.memory_guard.register_shedder('preview', self.disable_preview)
+        self.memory_guard.register_shedder('continuous_recording', self.disable_continuous_recording)
+        if self.status_board is not None:
+            self.memory_guard.register_shedder('status_board', self.disable_status_board)
+        self.memory_guard.install_signal_handler()
+        
         # Video recording setup
         self.incident_video_writer = None
         self.continuous_video_writer = None
         self.current_incident_video_path = None
         self.current_continuous_video_path = None
+        self.continuous_recording_enabled = True
         
         # Qt window setup
         if self.display_method == 'qt':
@@ -142,6 +190,8 @@ class PeopleMonitor:
             self.logger.error(f"Failed to send email: {e}")
 
     def start_continuous_recording(self):
+        if not self.continuous_recording_enabled:
+            return
         try:
             # Stop any existing continuous recording
             self.stop_continuous_recording()
@@ -169,6 +219,8 @@ class PeopleMonitor:
             self.logger.info(f"Started continuous recording: {self.current_continuous_video_path}")
         except Exception as e:
             self.logger.error(f"Error starting continuous recording: {e}")
+            if self.continuous_video_writer is not None:
+                self.continuous_video_writer.release()
             self.continuous_video_writer = None
 
     def stop_continuous_recording(self):
@@ -183,6 +235,15 @@ class PeopleMonitor:
             self.continuous_video_writer = None
             self.current_continuous_video_path = None
 
+    def disable_continuous_recording(self):
+        self.continuous_recording_enabled = False
+        self.stop_continuous_recording()
+
+    def disable_preview(self):
+        if self.display_method == 'qt':
+            self.display_method = 'terminal'
+            self.window.close()
+
     def start_incident_recording(self):
         try:
             # Stop any existing incident recording
@@ -211,6 +272,8 @@ class PeopleMonitor:
             self.logger.info(f"Started incident recording: {self.current_incident_video_path}")
         except Exception as e:
             self.logger.error(f"Error starting incident recording: {e}")
+            if self.incident_video_writer is not None:
+                self.incident_video_writer.release()
             self.incident_video_writer = None
 
     def stop_incident_recording(self):
@@ -225,6 +288,30 @@ class PeopleMonitor:
             self.incident_video_writer = None
             self.current_incident_video_path = None
 
+    def disable_pending_frames(self):
+        # Incidents still record from confirmation onwards, just without the lead-in frames
+        self.pending_frames = deque(maxlen=0)
+
+    def disable_status_board(self):
+        if self.status_board is not None:
+            self.status_board.close()
+            self.status_board = None
+
+    def write_incident_frame(self, frame):
+        if self.incident_video_writer is not None:
+            try:
+                self.incident_video_writer.write(frame)
+            except Exception as e:
+                self.logger.error(f"Error writing incident video frame: {e}")
+
+    def end_incident(self):
+        incident = self.incident_state.incidents[-1]
+        self.stop_incident_recording()
+        self.logger.info(f"Incident ended after {incident.duration:.1f}s "
+                         f"(minimum {incident.min_count} person(s) detected)")
+        if self.fleet_publisher is not None:
+            self.fleet_publisher.publish_incident('end', self.people_count)
+
     def display_frame(self, frame, people_count):
         try:
             # Clear the previous line in terminal
@@ -278,10 +365,7 @@ class PeopleMonitor:
                 self.logger.error("Error: Could not open camera.")
                 return
 
-            incident_recording_started = False
             print("\n")  # Add initial newline for status updates
-            last_alert_time = 0
-            alert_interval = 5  # Minimum seconds between alerts
             
             # Start continuous recording immediately
             self.start_continuous_recording()
@@ -296,14 +380,20 @@ class PeopleMonitor:
                 results = self.model(frame, verbose=False)
                 
                 # Filter only person class (class 0 is person)
-                people = [box for box in results[0].boxes if int(box.cls) == 0]
+                people = person_boxes(results[0])
                 people_count = len(people)
+                self.people_count = people_count
+                
+                # Publish the count to the fleet collector
+                if self.fleet_publisher is not None:
+                    self.fleet_publisher.publish_count(people_count)
                 
                 # Update LEDs based on people count
                 self.update_leds(people_count)
                 
                 # Draw bounding boxes
                 frame_with_boxes = frame.copy()
+                self.frame_bytes = frame.nbytes + frame_with_boxes.nbytes
                 for box in people:
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     color = (0, 0, 255) if people_count < self.min_people else (0, 255, 0)
@@ -326,27 +416,36 @@ class PeopleMonitor:
                 
                 current_time = time.time()
                 
-                # Handle incident recording if fewer than minimum people
-                if people_count < self.min_people:
-                    if not incident_recording_started:
-                        self.start_incident_recording()
-                        incident_recording_started = True
-                    
-                    if self.incident_video_writer is not None:
-                        try:
-                            self.incident_video_writer.write(frame_with_boxes)
-                        except Exception as e:
-                            self.logger.error(f"Error writing incident video frame: {e}")
-                    
-                    # Only log alerts at the specified interval
-                    if current_time - last_alert_time >= alert_interval:
-                        alert_message = f"SECURITY ALERT: Only {people_count} person(s) detected in sensitive project area!"
-                        self.logger.warning(alert_message)
-                        last_alert_time = current_time
+                # Debounce the count into incidents: one recording and one alert per real incident
+                event = self.incident_state.update(people_count, current_time)
+                if event == 'start':
+                    self.start_incident_recording()
+                    alert_message = f"SECURITY ALERT: Only {people_count} person(s) detected in sensitive project area!"
+                    self.logger.warning(alert_message)
+                    if self.fleet_publisher is not None:
+                        self.fleet_publisher.publish_incident('start', people_count)
+                    # Include the frames seen while the incident was being confirmed
+                    for pending_frame in self.pending_frames:
+                        self.write_incident_frame(pending_frame)
+                elif event == 'end':
+                    self.end_incident()
+                
+                if self.incident_state.in_incident:
+                    self.write_incident_frame(frame_with_boxes)
+                    self.pending_frames.clear()
+                elif self.incident_state.state == PENDING:
+                    self.pending_frames.append(frame_with_boxes)
                 else:
-                    if incident_recording_started:
-                        self.stop_incident_recording()
-                        incident_recording_started = False
+                    self.pending_frames.clear()
+                
+                # Publish to the status board; readers never block this
+                if self.status_board is not None:
+                    try:
+                        self.status_board.publish(frame, frame_with_boxes, people_count, self.incident_state.state)
+                    except Exception as e:
+                        self.logger.error(f"Error publishing to status board: {e}")
+                
+                self.memory_guard.check()
                 
                 time.sleep(0.05)  # Reduced sleep time for smoother operation
             
@@ -363,7 +462,11 @@ class PeopleMonitor:
             # Ensure cleanup happens
             if hasattr(self, 'cap') and self.cap is not None:
                 self.cap.release()
+            if self.incident_state.finish(time.time()) == 'end':
+                self.end_incident()
+            self.pending_frames.clear()
             self.stop_incident_recording()
+            self.disable_status_board()
             self.stop_continuous_recording()
 
     def start_monitoring(self):
@@ -379,6 +482,8 @@ class PeopleMonitor:
             self.cap.release()
         self.stop_incident_recording()
         self.stop_continuous_recording()
+        if self.fleet_publisher is not None:
+            self.fleet_publisher.close()
         # Turn off LEDs before closing
         if self.serial_port is not None:
             try:
@@ -0,0 +1,195 @@
+import gc
+import logging
+import os
+import signal
+import time
+import tracemalloc
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss():
+    """Return the current resident set size of this process in bytes, or None if it can't be measured."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    # No /proc (e.g. macOS). getrusage() only reports the peak, which never goes
+    # down, so it can't be used to decide when to shed.
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def tracing_overhead():
+    """Return the bytes tracemalloc itself uses to store traces (0 when not tracing)."""
+    return tracemalloc.get_tracemalloc_memory() if tracemalloc.is_tracing() else 0
+
+
+class MemoryGuard:
+    """Track process memory, take tracemalloc snapshots on demand and shed features over budget.
+
+    Components report their own size through register_component(); optional
+    features register a shed callback through register_shedder() in the order
+    they should be dropped.
+    """
+
+    def __init__(self,
+                 budget_mb=None,
+                 check_interval=10.0,
+                 tracemalloc_frames=10,
+                 max_snapshots=4):
+        self.logger = logging.getLogger(__name__)
+        self.budget_bytes = budget_mb * 1024 * 1024 if budget_mb else None
+        self.check_interval = check_interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.max_snapshots = max_snapshots
+
+        self.components = {}
+        self.shedders = []
+        self.shed = []
+        self.snapshots = []
+        self.last_check = 0
+        self.peak_rss = 0
+        self.budget_exhausted = False
+        self.warned_unmeasurable = False
+
+    def register_component(self, name, size_fn):
+        """Register a callable returning the bytes currently held by a component."""
+        self.components[name] = size_fn
+
+    def register_shedder(self, name, shed_fn):
+        """Register an optional feature to disable when over budget; earlier ones are shed first."""
+        self.shedders.append((name, shed_fn))
+
+    def component_sizes(self):
+        sizes = {}
+        for name, size_fn in self.components.items():
+            try:
+                sizes[name] = size_fn()
+            except Exception as e:
+                self.logger.error(f"Failed to measure memory for {name}: {e}")
+        return sizes
+
+    def status(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        return {
+            'rss': rss,
+            'peak_rss': self.peak_rss,
+            'budget': self.budget_bytes,
+            'components': self.component_sizes(),
+            'shed': list(self.shed),
+        }
+
+    def budget_rss(self):
+        """Return the RSS counted against the budget, or None if it can't be measured.
+
+        Tracing started by a SIGUSR1 report stays on so later reports can diff
+        against the baseline; its trace storage is left out so that running
+        diagnostics never sheds features.
+        """
+        rss = current_rss()
+        if rss is None:
+            return None
+        return rss - tracing_overhead()
+
+    def check(self, now=None):
+        """Check RSS against the budget at most every check_interval seconds, shedding one feature per check."""
+        now = time.time() if now is None else now
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+
+        rss = self.budget_rss()
+        if rss is None:
+            if self.budget_bytes is not None and not self.warned_unmeasurable:
+                self.warned_unmeasurable = True
+                self.logger.warning("Current RSS is not available on this platform (install psutil), "
+                                    "memory budget not enforced")
+            return
+        self.peak_rss = max(self.peak_rss, rss)
+        if self.budget_bytes is None or rss <= self.budget_bytes:
+            return
+
+        # Try reclaiming garbage before giving anything up
+        gc.collect()
+        rss = self.budget_rss()
+        if rss <= self.budget_bytes:
+            return
+
+        remaining = [(name, shed_fn) for name, shed_fn in self.shedders if name not in self.shed]
+        if not remaining:
+            if self.budget_exhausted:
+                return
+            self.budget_exhausted = True
+            self.logger.error(f"Memory over budget ({rss / 1048576:.1f} MB > "
+                              f"{self.budget_bytes / 1048576:.1f} MB) with nothing left to shed")
+            return
+
+        name, shed_fn = remaining[0]
+        self.logger.warning(f"Memory over budget ({rss / 1048576:.1f} MB > "
+                            f"{self.budget_bytes / 1048576:.1f} MB), shedding {name}")
+        try:
+            shed_fn()
+        except Exception as e:
+            self.logger.error(f"Failed to shed {name}: {e}")
+        self.shed.append(name)
+        gc.collect()
+
+    def take_snapshot(self, label=None):
+        """Take a tracemalloc snapshot, starting tracing on first use."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self.logger.info("Started tracemalloc; the first snapshot is the baseline")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        label = label or datetime_label()
+        self.snapshots.append((label, snapshot))
+        # Keep the oldest snapshot as a baseline and drop the ones in between
+        if len(self.snapshots) > self.max_snapshots:
+            del self.snapshots[1]
+        self.logger.info(f"Took memory snapshot {label} (RSS {format_mb(current_rss())})")
+        return label
+
+    def diff_snapshots(self, older=None, newer=None, key_type='lineno', limit=15):
+        """Return the largest allocation growths between two snapshots (default: the last two)."""
+        snapshots = dict(self.snapshots)
+        if len(self.snapshots) < 2 and (older is None or newer is None):
+            return []
+        old_snapshot = snapshots[older] if older else self.snapshots[-2][1]
+        new_snapshot = snapshots[newer] if newer else self.snapshots[-1][1]
+        stats = new_snapshot.compare_to(old_snapshot, key_type)
+        return stats[:limit]
+
+    def log_report(self):
+        """Take a snapshot and log status plus the diff against the previous snapshot."""
+        self.take_snapshot()
+        status = self.status()
+        self.logger.info(f"Memory: RSS {format_mb(status['rss'])}, peak {format_mb(status['peak_rss'])}, "
+                         f"shed {status['shed'] or 'nothing'}, tracemalloc {format_mb(tracing_overhead())}")
+        for name, size in status['components'].items():
+            self.logger.info(f"  {name}: {size / 1048576:.2f} MB")
+        for stat in self.diff_snapshots():
+            self.logger.info(f"  {stat}")
+
+    def install_signal_handler(self, signum=getattr(signal, 'SIGUSR1', None)):
+        """Log a memory report whenever the process receives signum (e.g. `kill -USR1 <pid>`)."""
+        if signum is None:
+            return
+        signal.signal(signum, lambda *_: self.log_report())
+
+
+def format_mb(size):
+    return 'unknown' if size is None else f"{size / 1048576:.1f} MB"
+
+
+def datetime_label():
+    return time.strftime("%Y%m%d_%H%M%S")
@@ -0,0 +1,364 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from detection import person_boxes
+from incident_state import IncidentStateMachine
+
+STATE_FILE = 'reanalysis_state.json'
+# incident_recording_*.mp4 clips are excluded: they repeat parts of the continuous recordings
+DEFAULT_PATTERNS = ('continuous_recording_*.mp4', 'security_recording_*.avi')
+
+# Settings that change speed but not results, so they don't invalidate earlier work
+NON_RESULT_SETTINGS = ('batch_size',)
+
+# Per-process model, loaded once by the pool initializer
+_model = None
+
+
+def _init_worker(model_path, torch_threads):
+    """Load the model once per worker and keep each worker to its share of the cores."""
+    global _model
+    import cv2
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(1)
+    _model = YOLO(model_path)
+
+
+def recording_start_time(path):
+    """Parse the wall-clock start time from a recording's file name, if it has one."""
+    match = re.search(r'_(\d{8}_\d{6})\.', os.path.basename(path))
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _load_progress(progress_path, settings_key, stat):
+    """Return saved progress for a partly analyzed file, or None if it doesn't apply anymore."""
+    try:
+        with open(progress_path) as f:
+            progress = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if (progress.get('settings_key') != settings_key
+            or progress.get('size') != stat.st_size or progress.get('mtime') != stat.st_mtime):
+        return None
+    return progress
+
+
+def _seek(cap, path, frame_index):
+    """Position the capture at frame_index, falling back to skipping frames if the backend can't seek exactly."""
+    import cv2
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_index:
+        return cap
+    cap.release()
+    cap = cv2.VideoCapture(path)
+    for _ in range(frame_index):
+        if not cap.grab():
+            break
+    return cap
+
+
+def analyze_file(path, output_dir, settings, settings_key, checkpoint_interval=60.0):
+    """Decode a recording once, count people per frame in batches and derive incidents.
+
+    Per-second counts are appended to the counts CSV as each second completes, and
+    progress (frame position, CSV length, incident state) is checkpointed every
+    checkpoint_interval seconds, so an interrupted file resumes where it stopped.
+    """
+    import cv2
+
+    counts_path = os.path.join(output_dir, os.path.basename(path) + '.counts.csv')
+    progress_path = os.path.join(output_dir, os.path.basename(path) + '.progress.json')
+    stat = os.stat(path)
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+    stride = max(1, int(round(fps / settings['sample_fps']))) if settings['sample_fps'] else 1
+
+    machine = IncidentStateMachine(settings['min_people'],
+                                   enter_dwell=settings['enter_dwell'],
+                                   exit_dwell=settings['exit_dwell'],
+                                   hysteresis=settings['hysteresis'],
+                                   max_history=None)
+    progress = _load_progress(progress_path, settings_key, stat)
+    if progress is not None and os.path.exists(counts_path):
+        frame_index = progress['frame_index']
+        analyzed_frames = progress['analyzed_frames']
+        last_time = progress['last_time']
+        # Second still being filled in: [second, min_count, max_count, frames]
+        current = progress['current_second']
+        machine.restore(progress['machine'])
+        counts_file = open(counts_path, 'r+', newline='')
+        counts_file.truncate(progress['counts_offset'])
+        counts_file.seek(progress['counts_offset'])
+        cap = _seek(cap, path, frame_index)
+    else:
+        frame_index = 0
+        analyzed_frames = 0
+        last_time = None
+        current = None
+        counts_file = open(counts_path, 'w', newline='')
+        csv.writer(counts_file).writerow(['second', 'min_count', 'max_count', 'frames'])
+    writer = csv.writer(counts_file)
+
+    batch = []
+    batch_times = []
+    last_checkpoint = time.time()
+
+    def flush():
+        nonlocal current, last_time, analyzed_frames
+        results = _model(batch, imgsz=settings['imgsz'], verbose=False)
+        for timestamp, result in zip(batch_times, results):
+            people_count = len(person_boxes(result))
+            machine.update(people_count, timestamp)
+            last_time = timestamp
+            analyzed_frames += 1
+            second = int(timestamp)
+            if current is None or current[0] != second:
+                if current is not None:
+                    writer.writerow(current)
+                current = [second, people_count, people_count, 0]
+            current[1] = min(current[1], people_count)
+            current[2] = max(current[2], people_count)
+            current[3] += 1
+        batch.clear()
+        batch_times.clear()
+
+    def checkpoint():
+        counts_file.flush()
+        tmp_path = progress_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'settings_key': settings_key,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'frame_index': frame_index,
+                'analyzed_frames': analyzed_frames,
+                'last_time': last_time,
+                'current_second': current,
+                'counts_offset': counts_file.tell(),
+                'machine': machine.checkpoint(),
+            }, f)
+        os.replace(tmp_path, progress_path)
+
+    try:
+        while True:
+            # grab() skips decoding frames we are not going to look at
+            if not cap.grab():
+                break
+            if frame_index % stride == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                batch.append(frame)
+                batch_times.append(frame_index / fps)
+            frame_index += 1
+            if len(batch) >= settings['batch_size']:
+                flush()
+                # Only checkpoint with an empty batch so frame_index matches what has been counted
+                if time.time() - last_checkpoint >= checkpoint_interval:
+                    checkpoint()
+                    last_checkpoint = time.time()
+        if batch:
+            flush()
+        if current is not None:
+            writer.writerow(current)
+    finally:
+        cap.release()
+        counts_file.close()
+
+    if last_time is not None:
+        machine.finish(last_time)
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return {
+        'frames': frame_index,
+        'analyzed_frames': analyzed_frames,
+        'duration': frame_index / fps,
+        'counts': os.path.basename(counts_path),
+        'incidents': [incident.to_dict() for incident in machine.incidents],
+    }
+
+
+class ReanalysisJob:
+    """Fan recordings out across a process pool; a rerun skips finished files and resumes partial ones."""
+
+    def __init__(self, files, output_dir, settings, workers=None, checkpoint_interval=60.0):
+        self.logger = logging.getLogger(__name__)
+        self.files = sorted(set(os.path.abspath(path) for path in files))
+        self.output_dir = output_dir
+        self.settings = settings
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint_interval = checkpoint_interval
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        # Results are only reused when produced with the same settings and the same weights,
+        # so replacing the model file in place still triggers a re-run
+        key_settings = {key: value for key, value in settings.items()
+                        if key not in NON_RESULT_SETTINGS and key != 'model'}
+        key_settings['model_sha1'] = file_sha1(settings['model'])
+        self.settings_key = hashlib.sha1(json.dumps(key_settings, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {'settings_key': self.settings_key, 'files': {}}
+        if state.get('settings_key') != self.settings_key:
+            self.logger.info("Settings changed since the last run, starting over")
+            return {'settings_key': self.settings_key, 'files': {}}
+        return state
+
+    def _save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _is_done(self, path):
+        entry = self.state['files'].get(path)
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        # A recording that has grown or been replaced since must be redone
+        return entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+
+    def run(self):
+        pending = [path for path in self.files if not self._is_done(path)]
+        skipped = len(self.files) - len(pending)
+        if skipped:
+            self.logger.info(f"Resuming: {skipped} file(s) already done")
+        if not pending:
+            return self.state['files']
+
+        workers = min(self.workers, len(pending))
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        self.logger.info(f"Analyzing {len(pending)} file(s) with {workers} worker(s), "
+                         f"{torch_threads} torch thread(s) each")
+
+        start = time.time()
+        analyzed_frames = 0
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.settings['model'], torch_threads)) as pool:
+            futures = {pool.submit(analyze_file, path, self.output_dir, self.settings,
+                                   self.settings_key, self.checkpoint_interval): path
+                       for path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error(f"Failed to analyze {path}: {e}")
+                    continue
+                stat = os.stat(path)
+                result.update(size=stat.st_size, mtime=stat.st_mtime, start_time=recording_start_time(path))
+                self.state['files'][path] = result
+                self._save_state()
+                analyzed_frames += result['analyzed_frames']
+                elapsed = time.time() - start
+                self.logger.info(f"[{done}/{len(pending)}] {os.path.basename(path)}: "
+                                 f"{len(result['incidents'])} incident(s), {analyzed_frames / elapsed:.1f} frames/s overall")
+        return self.state['files']
+
+    def write_incidents(self):
+        """Write all derived incidents to a single CSV, with wall-clock times where known."""
+        path = os.path.join(self.output_dir, 'incidents.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['file', 'start', 'end', 'duration', 'min_count'])
+            for file_path in self.files:
+                entry = self.state['files'].get(file_path)
+                if entry is None:
+                    continue
+                offset = entry.get('start_time')
+                for incident in entry['incidents']:
+                    start, end = incident['start_time'], incident['end_time']
+                    if offset is not None:
+                        start = datetime.fromtimestamp(offset + start).isoformat(timespec='seconds')
+                        end = datetime.fromtimestamp(offset + end).isoformat(timespec='seconds')
+                    writer.writerow([os.path.basename(file_path), start, end,
+                                     f"{incident['duration']:.1f}", incident['min_count']])
+        return path
+
+
+def find_recordings(inputs):
+    """Expand directories to the monitor's recording files; pass files and globs through."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in DEFAULT_PATTERNS:
+                files.extend(glob.glob(os.path.join(item, pattern)))
+        else:
+            files.extend(glob.glob(item))
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-analyze archived recordings with the people detection logic")
+    parser.add_argument('inputs', nargs='+', help="Recording files, globs or directories (e.g. ./monitoring_logs)")
+    parser.add_argument('--output', default='./reanalysis', help="Directory for counts, incidents and job state")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+    parser.add_argument('--model', default='yolov8n.pt', help="Local YOLO weights file")
+    parser.add_argument('--min-people', type=int, default=2)
+    parser.add_argument('--enter-dwell', type=float, default=1.0)
+    parser.add_argument('--exit-dwell', type=float, default=3.0)
+    parser.add_argument('--hysteresis', type=int, default=0)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--sample-fps', type=float, default=0,
+                        help="Analyze at most this many frames per second (default: every frame)")
+    parser.add_argument('--checkpoint-interval', type=float, default=60.0,
+                        help="Seconds between progress checkpoints within a file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+
+    if not os.path.exists(args.model):
+        # Don't let ultralytics try to download weights; the job is meant to run offline
+        parser.error(f"Model weights not found: {args.model}")
+
+    files = find_recordings(args.inputs)
+    if not files:
+        parser.error("No recordings found")
+
+    settings = {
+        'model': os.path.abspath(args.model),
+        'min_people': args.min_people,
+        'enter_dwell': args.enter_dwell,
+        'exit_dwell': args.exit_dwell,
+        'hysteresis': args.hysteresis,
+        'imgsz': args.imgsz,
+        'batch_size': args.batch_size,
+        'sample_fps': args.sample_fps,
+    }
+    job = ReanalysisJob(files, args.output, settings, workers=args.workers,
+                        checkpoint_interval=args.checkpoint_interval)
+    job.run()
+    print(f"Incidents written to {job.write_incidents()}")
@@ -0,0 +1,263 @@
+import argparse
+import logging
+import os
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+DEFAULT_BOARD_NAME = 'odin_babycam_status'
+
+MAGIC = b'ODSB'
+VERSION = 2
+
+# Board header: magic, version, slot count, height, width, channels, slot size,
+# generation (random per writer), alive flag, latest slot index
+HEADER = struct.Struct('<4sIIIIIQQI4xq')
+HEADER_SIZE = 64
+ALIVE_OFFSET = 40
+LATEST_OFFSET = HEADER.size - 8
+
+# Slot header: seqlock counter (odd while the writer is inside the slot), frame number,
+# timestamp, people count, incident state
+SLOT_HEADER = struct.Struct('<QQdii')
+SLOT_HEADER_SIZE = 64
+
+INCIDENT_STATES = ('clear', 'pending', 'active', 'recovering')
+
+
+class StatusBoardWriter:
+    """Publish the latest frames, count and incident state into a shared-memory ring.
+
+    Each slot is guarded by a seqlock: the writer bumps the slot counter to an odd
+    value, fills the slot, then bumps it back to even. The writer never waits on
+    readers; a reader that is too slow simply sees the counter change and retries.
+    """
+
+    def __init__(self, name=DEFAULT_BOARD_NAME, slots=4):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.slots = slots
+        self.shm = None
+        self.shape = None
+        self.frame_number = 0
+        self.next_slot = 0
+
+    def _create(self, shape):
+        height, width, channels = shape
+        frame_size = height * width * channels
+        slot_size = SLOT_HEADER_SIZE + 2 * frame_size
+        size = HEADER_SIZE + self.slots * slot_size
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a monitor that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+
+        self.shape = shape
+        self.slot_size = slot_size
+        self.frame_size = frame_size
+        for slot in range(self.slots):
+            SLOT_HEADER.pack_into(self.shm.buf, self._slot_offset(slot), 0, 0, 0.0, 0, 0)
+        # A fresh generation lets attached readers tell this board apart from a previous monitor's
+        generation = int.from_bytes(os.urandom(8), 'little')
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, self.slots, height, width, channels, slot_size,
+                         generation, 1, -1)
+        self.logger.info(f"Status board '{self.name}' created ({size / 1048576:.1f} MB, {self.slots} slots)")
+
+    def _slot_offset(self, slot):
+        return HEADER_SIZE + slot * self.slot_size
+
+    def publish(self, raw_frame, annotated_frame, people_count, incident_state):
+        """Copy the frames into the next slot and mark it as the latest."""
+        if self.shm is None:
+            self._create(raw_frame.shape)
+        if raw_frame.shape != self.shape or annotated_frame.shape != self.shape:
+            self.logger.warning(f"Frame shape {raw_frame.shape} does not match status board {self.shape}, skipping")
+            return
+
+        slot = self.next_slot
+        offset = self._slot_offset(slot)
+        buf = self.shm.buf
+        seq = struct.unpack_from('<Q', buf, offset)[0]
+
+        # Enter the slot: odd counter tells readers it is being written
+        struct.pack_into('<Q', buf, offset, seq + 1)
+        self.frame_number += 1
+        SLOT_HEADER.pack_into(buf, offset, seq + 1, self.frame_number, time.time(), people_count,
+                              INCIDENT_STATES.index(incident_state))
+        data_offset = offset + SLOT_HEADER_SIZE
+        np.ndarray(self.shape, np.uint8, buf, data_offset)[...] = annotated_frame
+        np.ndarray(self.shape, np.uint8, buf, data_offset + self.frame_size)[...] = raw_frame
+        # Leave the slot, then point readers at it
+        struct.pack_into('<Q', buf, offset, seq + 2)
+        struct.pack_into('<q', buf, LATEST_OFFSET, slot)
+
+        self.next_slot = (slot + 1) % self.slots
+
+    def close(self):
+        if self.shm is not None:
+            # Tell readers still mapping this segment that it is gone
+            struct.pack_into('<I', self.shm.buf, ALIVE_OFFSET, 0)
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class Snapshot:
+    """The newest board entry. Frames are views into shared memory, valid while valid() is True."""
+
+    def __init__(self, buf, offset, seq, frame_number, timestamp, people_count, incident_state, frame, raw_frame):
+        self._buf = buf
+        self._offset = offset
+        self.seq = seq
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.people_count = people_count
+        self.incident_state = incident_state
+        self.frame = frame
+        self.raw_frame = raw_frame
+
+    def valid(self):
+        """Return True if the writer has not closed the board or started overwriting this slot since it was read."""
+        return (struct.unpack_from('<I', self._buf, ALIVE_OFFSET)[0] == 1
+                and struct.unpack_from('<Q', self._buf, self._offset)[0] == self.seq)
+
+
+class StatusBoardReader:
+    """Attach to a monitor's status board from any local process without touching the camera.
+
+    If the monitor restarts, the reader notices (the old board is marked closed,
+    or no new frame arrives for reattach_after seconds and the name now points to
+    a board of a different generation) and attaches to the new board.
+    """
+
+    def __init__(self, name=DEFAULT_BOARD_NAME, reattach_after=5.0):
+        self.name = name
+        self.reattach_after = reattach_after
+        self.shm = None
+        self.generation = None
+        self.last_attach_attempt = 0
+        self.last_timestamp = None
+        try:
+            self._attach(self._open())
+        except (FileNotFoundError, ValueError):
+            # The monitor has not published yet; latest() attaches once it has
+            pass
+
+    def _open(self):
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the segment for unlinking at exit
+            shm = shared_memory.SharedMemory(name=self.name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        magic, version, slots, height, width, channels, slot_size, generation, _, _ = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise ValueError(f"'{self.name}' is not a version {VERSION} status board")
+        return shm, generation, slots, (height, width, channels), slot_size
+
+    def _attach(self, opened):
+        self._release()
+        self.shm, self.generation, self.slots, self.shape, self.slot_size = opened
+        self.frame_size = self.shape[0] * self.shape[1] * self.shape[2]
+        self.last_timestamp = None
+
+    def _release(self):
+        if self.shm is None:
+            return
+        try:
+            self.shm.close()
+        except BufferError:
+            # A caller still holds frame views; the mapping goes away with them
+            pass
+        self.shm = None
+
+    def _alive(self):
+        return self.shm is not None and struct.unpack_from('<I', self.shm.buf, ALIVE_OFFSET)[0] == 1
+
+    def _reattach(self):
+        """Attach to the board currently under our name if it is a new generation; return True if attached."""
+        now = time.time()
+        if now - self.last_attach_attempt < 1.0:
+            return False
+        self.last_attach_attempt = now
+        try:
+            opened = self._open()
+        except (FileNotFoundError, ValueError):
+            return False
+        if self.shm is not None and opened[1] == self.generation:
+            opened[0].close()
+            return False
+        self._attach(opened)
+        return True
+
+    def latest(self, retries=3):
+        """Return a Snapshot of the newest slot, or None if nothing consistent could be read."""
+        if not self._alive():
+            # The monitor closed this board; wait for it to come back
+            if not self._reattach():
+                return None
+        elif self.last_timestamp is not None and time.time() - self.last_timestamp > self.reattach_after:
+            # No new frames: the monitor may have died without closing the board
+            self._reattach()
+
+        buf = self.shm.buf
+        for _ in range(retries):
+            slot = struct.unpack_from('<q', buf, LATEST_OFFSET)[0]
+            if slot < 0:
+                return None
+            offset = HEADER_SIZE + slot * self.slot_size
+            seq, frame_number, timestamp, people_count, state = SLOT_HEADER.unpack_from(buf, offset)
+            if seq % 2:
+                # Writer is inside this slot; the header will point elsewhere shortly
+                time.sleep(0.001)
+                continue
+            data_offset = offset + SLOT_HEADER_SIZE
+            frame = np.ndarray(self.shape, np.uint8, buf, data_offset)
+            raw_frame = np.ndarray(self.shape, np.uint8, buf, data_offset + self.frame_size)
+            snapshot = Snapshot(buf, offset, seq, frame_number, timestamp, people_count,
+                                INCIDENT_STATES[state], frame, raw_frame)
+            if snapshot.valid():
+                if self.last_timestamp is None or timestamp > self.last_timestamp:
+                    self.last_timestamp = timestamp
+                return snapshot
+        return None
+
+    def close(self):
+        self._release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the people monitor's shared-memory status board")
+    parser.add_argument('--name', default=DEFAULT_BOARD_NAME)
+    parser.add_argument('--save', help="Save the newest annotated frame to this image file")
+    parser.add_argument('--raw', action='store_true', help="Save the raw frame instead of the annotated one")
+    args = parser.parse_args()
+
+    reader = StatusBoardReader(args.name)
+    snapshot = reader.latest()
+    if snapshot is None:
+        print("No frame published yet")
+    else:
+        age = time.time() - snapshot.timestamp
+        print(f"Frame {snapshot.frame_number} ({age:.2f}s ago): {snapshot.people_count} person(s), "
+              f"incident {snapshot.incident_state}")
+        if args.save:
+            import cv2
+            image = snapshot.raw_frame if args.raw else snapshot.frame
+            # Copy out before encoding so the writer can keep going, then make sure it was not torn
+            image = image.copy()
+            if snapshot.valid():
+                cv2.imwrite(args.save, image)
+                print(f"Saved {args.save}")
+            else:
+                print("Frame was overwritten while saving, try again")
+    # Drop the views before closing the shared memory
+    snapshot = None
+    reader.close()
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import FleetCollector, SiteRule
+
+
+def datagram(node_id, seq, *events, boot_id='boot'):
+    return json.dumps({'n': node_id, 'b': boot_id, 's': seq, 'e': list(events)}).encode('utf-8')
+
+
+def collector():
+    alerts = []
+    fleet = FleetCollector(rules=[SiteRule('clean', ['a', 'b'], 2)],
+                           alert_callback=lambda key, message: alerts.append(key),
+                           stale_after=15.0)
+    return fleet, alerts
+
+
+def test_rule_waits_for_every_node_at_startup():
+    fleet, alerts = collector()
+    fleet.handle_datagram(datagram('a', 0, ['c', 0.0, 1, 0]), now=0.0)
+    assert alerts == []
+    assert ('rule', 'clean') not in fleet.active_alerts
+
+    fleet.handle_datagram(datagram('b', 0, ['c', 0.5, 1, 0]), now=0.5)
+    assert alerts == []
+
+    fleet.handle_datagram(datagram('b', 1, ['c', 1.0, 0, 0]), now=1.0)
+    assert alerts == [('rule', 'clean')]
+
+
+def test_stale_node_raises_only_a_stale_alert():
+    fleet, alerts = collector()
+    fleet.handle_datagram(datagram('a', 0, ['c', 0.0, 1, 0]), now=0.0)
+    fleet.handle_datagram(datagram('b', 0, ['c', 0.0, 1, 0]), now=0.0)
+    assert alerts == []
+
+    # b goes quiet while a keeps reporting
+    for seq in range(1, 5):
+        fleet.handle_datagram(datagram('a', seq, ['c', seq * 5.0, 1, 0]), now=seq * 5.0)
+    assert alerts == [('stale', 'b')]
+
+    # b comes back: the stale alert clears and the rule is checked again
+    fleet.handle_datagram(datagram('b', 1, ['c', 21.0, 2, 0]), now=21.0)
+    assert ('stale', 'b') not in fleet.active_alerts
+    assert alerts == [('stale', 'b')]
+
+
+def test_rule_alert_is_kept_while_a_node_is_stale():
+    fleet, alerts = collector()
+    fleet.handle_datagram(datagram('a', 0, ['c', 0.0, 0, 0]), now=0.0)
+    fleet.handle_datagram(datagram('b', 0, ['c', 0.0, 1, 0]), now=0.0)
+    assert alerts == [('rule', 'clean')]
+
+    fleet.handle_datagram(datagram('a', 1, ['c', 20.0, 0, 0]), now=20.0)
+    assert alerts == [('rule', 'clean'), ('stale', 'b')]
+    assert ('rule', 'clean') in fleet.active_alerts
+
+    fleet.handle_datagram(datagram('b', 1, ['c', 21.0, 2, 0]), now=21.0)
+    assert ('rule', 'clean') not in fleet.active_alerts
+    assert ('stale', 'b') not in fleet.active_alerts
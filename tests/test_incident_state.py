@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from incident_state import IncidentStateMachine, replay_counts
+
+FPS = 10
+
+
+def frames(*runs):
+    """Build (timestamp, count) samples at FPS from (count, number_of_frames) runs."""
+    samples = []
+    for people_count, length in runs:
+        for _ in range(length):
+            samples.append((len(samples) / FPS, people_count))
+    return samples
+
+
+def test_single_frame_dips_give_no_incident():
+    samples = frames(*[(2, 9), (1, 1)] * 30, (2, 10))
+    assert replay_counts(samples, min_people=2, enter_dwell=1.0, exit_dwell=3.0) == []
+
+
+def test_short_zero_dips_give_no_incident():
+    # Several frames below minimum, but never for a whole enter_dwell
+    samples = frames(*[(2, 20), (0, 5)] * 10, (2, 20))
+    assert replay_counts(samples, min_people=2, enter_dwell=1.0, exit_dwell=3.0) == []
+
+
+def test_dip_with_flickery_recovery_is_one_incident():
+    samples = frames(
+        (2, 50),    # 0.0 - 5.0s fine
+        (1, 40),    # 5.0 - 9.0s one person
+        (0, 10),    # 9.0 - 10.0s nobody
+        (2, 3),     # flicker back up, shorter than exit_dwell
+        (1, 7),
+        (2, 5),
+        (1, 5),
+        (2, 60),    # 12.0s recovered for good
+    )
+    machine = IncidentStateMachine(2, enter_dwell=1.0, exit_dwell=3.0)
+    events = [event for timestamp, people_count in samples
+              for event in [machine.update(people_count, timestamp)] if event]
+    assert events == ['start', 'end']
+
+    incidents = replay_counts(samples, min_people=2, enter_dwell=1.0, exit_dwell=3.0)
+    assert len(incidents) == 1
+    incident = incidents[0]
+    assert incident.start_time == 5.0
+    assert incident.end_time == 12.0
+    assert abs(incident.duration - 7.0) < 1e-9
+    assert incident.min_count == 0
+
+
+def test_zero_enter_dwell_starts_on_first_frame_below():
+    machine = IncidentStateMachine(2, enter_dwell=0, exit_dwell=0.5)
+    assert machine.update(2, 0.0) is None
+    assert machine.update(1, 0.1) == 'start'
+    assert machine.in_incident
+    assert machine.update(2, 0.2) is None
+    assert machine.update(2, 0.8) == 'end'
+    assert machine.incidents[0].start_time == 0.1
+    assert machine.incidents[0].end_time == 0.2
+
+
+def test_hysteresis_band_holds_incident():
+    # min_people=2 with hysteresis=1: two people is not enough to end an incident
+    samples = frames((1, 20), (2, 100), (1, 5), (3, 40))
+    incidents = replay_counts(samples, min_people=2, enter_dwell=1.0, exit_dwell=3.0, hysteresis=1)
+    assert len(incidents) == 1
+    assert incidents[0].start_time == 0.0
+    assert incidents[0].end_time == 12.5
+
+    # Without hysteresis the incident already ends when two people are back
+    incidents = replay_counts(samples, min_people=2, enter_dwell=1.0, exit_dwell=3.0)
+    assert len(incidents) == 1
+    assert incidents[0].end_time == 2.0
+
+
+def test_open_incident_is_closed_by_finish():
+    incidents = replay_counts(frames((2, 10), (0, 30)), min_people=2, enter_dwell=1.0)
+    assert len(incidents) == 1
+    assert incidents[0].start_time == 1.0
+    assert incidents[0].end_time == 3.9
+
+
+def test_checkpoint_and_restore_resume_the_same_incidents():
+    samples = frames((2, 30), (1, 40), (2, 10), (0, 20), (2, 50), (1, 30))
+    expected = [incident.to_dict() for incident in replay_counts(samples, min_people=2)]
+
+    # Stop partway through an incident, round-trip the state through JSON and carry on
+    first = IncidentStateMachine(2, max_history=None)
+    for timestamp, people_count in samples[:85]:
+        first.update(people_count, timestamp)
+    second = IncidentStateMachine(2, max_history=None)
+    second.restore(json.loads(json.dumps(first.checkpoint())))
+    for timestamp, people_count in samples[85:]:
+        second.update(people_count, timestamp)
+    second.finish(samples[-1][0])
+
+    assert [incident.to_dict() for incident in second.incidents] == expected
@@ -0,0 +1,153 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thermal_governor import TEMP_PATH, THROTTLED_PATH, ThermalGovernor
+
+LEVELS = [(1, 640), (2, 640), (2, 480), (4, 320)]
+
+
+class FakeSysfs:
+    """A sysfs tree under tmp_path holding the SoC temperature and firmware throttle state."""
+
+    def __init__(self, root):
+        self.root = str(root)
+        for path in (TEMP_PATH, THROTTLED_PATH):
+            os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+        self.set(50.0)
+
+    def set(self, temperature, throttled=0):
+        with open(os.path.join(self.root, TEMP_PATH), 'w') as f:
+            f.write(f"{int(temperature * 1000)}\n")
+        with open(os.path.join(self.root, THROTTLED_PATH), 'w') as f:
+            f.write(f"0x{throttled:x}\n")
+
+
+def governor(sysfs, **kwargs):
+    return ThermalGovernor(sysfs_root=sysfs.root, levels=LEVELS, **kwargs)
+
+
+def drive(gov, sysfs, now, temperature, throttled=0):
+    sysfs.set(temperature, throttled)
+    return gov.update(now=now)
+
+
+def test_heat_up_steps_down_after_delay_while_rising(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    assert drive(gov, sysfs, 100, 65.0) == 0
+
+    # Warm: the first step is immediate, the next waits out step_down_delay
+    assert drive(gov, sysfs, 102, 71.0) == 1
+    assert drive(gov, sysfs, 104, 73.0) == 1
+    assert drive(gov, sysfs, 110, 73.0) == 1
+    assert drive(gov, sysfs, 112, 73.0) == 2
+
+    # Delay elapsed, but the last step stopped the climb: hold
+    assert drive(gov, sysfs, 122, 73.5) == 2
+    assert drive(gov, sysfs, 124, 74.0) == 3
+    assert [d['reason'] for d in gov.decisions] == ['warm', 'warm', 'warm']
+    assert gov.detect_every == 4 and gov.imgsz == 320
+
+
+def test_hot_steps_down_without_delay_but_only_while_rising(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    assert drive(gov, sysfs, 100, 76.0) == 1
+    assert drive(gov, sysfs, 102, 76.5) == 1
+    assert drive(gov, sysfs, 104, 77.0) == 2
+    assert [d['reason'] for d in gov.decisions] == ['hot', 'hot']
+
+
+def test_holds_between_cool_and_warm(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    drive(gov, sysfs, 100, 71.0)
+    assert gov.level == 1
+    for i, temperature in enumerate([69.9, 66.0, 63.1, 68.0, 64.0] * 20):
+        assert drive(gov, sysfs, 102 + 2 * i, temperature) == 1
+    assert gov.level_changes == 1
+
+
+def test_cool_down_steps_up_after_delay(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    drive(gov, sysfs, 100, 77.0)
+    drive(gov, sysfs, 102, 78.0)
+    assert gov.level == 2
+
+    assert drive(gov, sysfs, 104, 62.0) == 2
+    assert drive(gov, sysfs, 130, 62.0) == 2
+    assert drive(gov, sysfs, 132, 62.0) == 1
+    assert drive(gov, sysfs, 134, 60.0) == 1
+    assert drive(gov, sysfs, 162, 60.0) == 0
+    assert [d['reason'] for d in gov.decisions][-2:] == ['cooled', 'cooled']
+
+
+def test_throttle_bits_step_down_immediately(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    # Only "since boot" bits set: nothing is throttling right now
+    assert drive(gov, sysfs, 100, 60.0, throttled=0x50000) == 0
+
+    assert drive(gov, sysfs, 102, 60.0, throttled=0x4) == 1
+    assert drive(gov, sysfs, 104, 60.0, throttled=0x2) == 2
+    decision = gov.decisions[-1]
+    assert decision['throttle_state'] == 0x2
+    assert decision['reason'] == 'throttle state 0x2'
+
+
+def test_levels_are_clamped_at_both_ends(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    drive(gov, sysfs, 100, 60.0)
+    drive(gov, sysfs, 200, 60.0)
+    assert gov.level == 0
+    assert gov.level_changes == 0
+
+    for i in range(10):
+        drive(gov, sysfs, 300 + 2 * i, 60.0, throttled=0x4)
+    assert gov.level == len(LEVELS) - 1
+    assert gov.level_changes == len(LEVELS) - 1
+    assert len(gov.decisions) == len(LEVELS) - 1
+
+
+def test_polls_at_most_every_check_interval(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs, check_interval=2.0)
+    drive(gov, sysfs, 100, 60.0)
+    assert drive(gov, sysfs, 101, 90.0) == 0
+    assert gov.readings == 1
+    assert drive(gov, sysfs, 102, 90.0) == 1
+    assert gov.readings == 2
+
+
+def test_read_errors_are_counted_and_missing_throttle_node_is_ignored(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    os.remove(os.path.join(sysfs.root, THROTTLED_PATH))
+    with open(os.path.join(sysfs.root, TEMP_PATH), 'w') as f:
+        f.write("71000\n")
+    assert gov.update(now=100) == 1
+    assert gov.throttle_state == 0
+
+    os.remove(os.path.join(sysfs.root, TEMP_PATH))
+    assert gov.update(now=102) == 1
+    assert gov.read_errors == 1
+    assert gov.metrics(now=102)['readings'] == 1
+
+
+def test_metrics_track_time_at_level(tmp_path):
+    sysfs = FakeSysfs(tmp_path)
+    gov = governor(sysfs)
+    drive(gov, sysfs, 100, 65.0)
+    drive(gov, sysfs, 110, 71.0)
+    drive(gov, sysfs, 140, 62.0)
+
+    metrics = gov.metrics(now=150)
+    assert metrics['level'] == 0
+    assert metrics['level_changes'] == 2
+    assert metrics['time_at_level'] == [10.0 + 10.0, 30.0, 0.0, 0.0]
+    assert metrics['temperature'] == 62.0
+    assert [(d['from_level'], d['to_level']) for d in metrics['recent_decisions']] == [(0, 1), (1, 0)]
@@ -0,0 +1,171 @@
+import logging
+import os
+import time
+from collections import deque
+
+# Default sysfs locations on Raspberry Pi OS
+DEFAULT_SYSFS_ROOT = '/sys'
+TEMP_PATH = 'class/thermal/thermal_zone0/temp'
+THROTTLED_PATH = 'devices/platform/soc/soc:firmware/get_throttled'
+
+# get_throttled bits that describe the current state (bits 16+ are "since boot")
+UNDER_VOLTAGE = 0x1
+FREQ_CAPPED = 0x2
+THROTTLED = 0x4
+SOFT_TEMP_LIMIT = 0x8
+
+# Detection levels from full quality to most conservative: (run detection every N frames, YOLO input size)
+DEFAULT_LEVELS = [
+    (1, 640),
+    (2, 640),
+    (2, 480),
+    (3, 416),
+    (4, 320),
+]
+
+
+class ThermalGovernor:
+    """Scale detection rate and resolution down before the SoC throttles, and back up once it cools."""
+
+    def __init__(self,
+                 sysfs_root=DEFAULT_SYSFS_ROOT,
+                 levels=None,
+                 warm_temp=70.0,
+                 hot_temp=76.0,
+                 cool_temp=63.0,
+                 check_interval=2.0,
+                 step_down_delay=10.0,
+                 step_up_delay=30.0,
+                 rise_margin=1.0):
+        self.logger = logging.getLogger(__name__)
+        self.temp_path = os.path.join(sysfs_root, TEMP_PATH)
+        self.throttled_path = os.path.join(sysfs_root, THROTTLED_PATH)
+        self.levels = levels or DEFAULT_LEVELS
+        # The Pi firmware starts soft throttling at 80C, so act well below that
+        self.warm_temp = warm_temp
+        self.hot_temp = hot_temp
+        self.cool_temp = cool_temp
+        self.check_interval = check_interval
+        self.step_down_delay = step_down_delay
+        self.step_up_delay = step_up_delay
+        # A further step down needs the temperature to have risen this much since the last change
+        self.rise_margin = rise_margin
+
+        self.level = 0
+        self.last_check = 0
+        self.last_change = 0
+        self.change_temperature = None
+        self.frame_index = 0
+
+        # Metrics
+        self.temperature = None
+        self.throttle_state = 0
+        self.readings = 0
+        self.read_errors = 0
+        self.level_changes = 0
+        self.time_at_level = [0.0] * len(self.levels)
+        self.level_since = None
+        self.decisions = deque(maxlen=100)
+
+    @property
+    def detect_every(self):
+        return self.levels[self.level][0]
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][1]
+
+    def should_detect(self):
+        """Return True if detection should run on the current frame."""
+        self.frame_index += 1
+        return self.frame_index % self.detect_every == 0
+
+    def read_temperature(self):
+        with open(self.temp_path) as f:
+            return int(f.read().strip()) / 1000.0
+
+    def read_throttle_state(self):
+        """Return the current get_throttled bits, or 0 if the firmware node is missing."""
+        try:
+            with open(self.throttled_path) as f:
+                return int(f.read().strip(), 16)
+        except FileNotFoundError:
+            return 0
+
+    def update(self, now=None):
+        """Poll sysfs at most every check_interval seconds and adjust the detection level."""
+        now = time.time() if now is None else now
+        if self.level_since is None:
+            self.level_since = now
+        if now - self.last_check < self.check_interval:
+            return self.level
+        self.last_check = now
+
+        try:
+            self.temperature = self.read_temperature()
+            self.throttle_state = self.read_throttle_state()
+            self.readings += 1
+        except (OSError, ValueError) as e:
+            self.read_errors += 1
+            self.logger.warning(f"Failed to read thermal state: {e}")
+            return self.level
+
+        throttled_now = self.throttle_state & (FREQ_CAPPED | THROTTLED | SOFT_TEMP_LIMIT | UNDER_VOLTAGE)
+        since_change = now - self.last_change
+        # Only keep stepping down while the last step has not stopped the climb
+        rising = self.change_temperature is None or self.temperature >= self.change_temperature + self.rise_margin
+
+        if throttled_now:
+            # Already throttling: back off immediately
+            self._set_level(self.level + 1, now, f"throttle state 0x{self.throttle_state:x}")
+        elif self.temperature >= self.hot_temp:
+            if rising:
+                self._set_level(self.level + 1, now, "hot")
+        elif self.temperature >= self.warm_temp:
+            if rising and since_change >= self.step_down_delay:
+                self._set_level(self.level + 1, now, "warm")
+        elif self.temperature <= self.cool_temp:
+            if since_change >= self.step_up_delay:
+                self._set_level(self.level - 1, now, "cooled")
+        # Between cool_temp and warm_temp hold the current level so detection doesn't swing
+        return self.level
+
+    def _set_level(self, level, now, reason):
+        level = max(0, min(level, len(self.levels) - 1))
+        if level == self.level:
+            return
+        self.time_at_level[self.level] += now - self.level_since
+        self.level_since = now
+        self.last_change = now
+        self.change_temperature = self.temperature
+        self.level_changes += 1
+        decision = {
+            'time': now,
+            'temperature': self.temperature,
+            'throttle_state': self.throttle_state,
+            'from_level': self.level,
+            'to_level': level,
+            'reason': reason,
+        }
+        self.decisions.append(decision)
+        self.level = level
+        self.logger.info(f"Thermal governor: level {decision['from_level']} -> {level} ({reason}, "
+                         f"{self.temperature:.1f}C), detecting every {self.detect_every} frame(s) at {self.imgsz}px")
+
+    def metrics(self, now=None):
+        now = time.time() if now is None else now
+        time_at_level = list(self.time_at_level)
+        if self.level_since is not None:
+            time_at_level[self.level] += now - self.level_since
+        return {
+            'temperature': self.temperature,
+            'throttle_state': self.throttle_state,
+            'level': self.level,
+            'detect_every': self.detect_every,
+            'imgsz': self.imgsz,
+            'readings': self.readings,
+            'read_errors': self.read_errors,
+            'level_changes': self.level_changes,
+            'time_at_level': time_at_level,
+            'recent_decisions': list(self.decisions),
+        }